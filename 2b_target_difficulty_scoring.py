@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import os
+from fit_cache import fit_mixedlm
+
+def select_day2_hits(df):
+    """ Keeps Day 2 single-target hit trials with a valid RT, the trials difficulty is scored from. """
+    mask = (df['Day'] == 2) & (df['IllegalItems'] == 1) & (df['TrialResult'] == 'Hit') & df['RT'].notna() & df['Illegal1Name'].notna()
+    return df.loc[mask, ['UserId', 'Illegal1Name', 'RT']].copy()
+
+def score_target_difficulty(df_day2_hits, split_targets, cache_dir=None):
+    """
+    Scores every target in one random-intercept model, RT ~ 0 + C(Illegal1Name) with a random intercept per user.
+    Each target's coefficient is its user-adjusted mean hit RT (higher = harder). Targets are split into
+    'high'/'low' difficulty at the median score of split_targets.
+    """
+    formula = 'RT ~ 0 + C(Illegal1Name)'
+    # All predictors are discrete, so the fit runs on per-(UserId, target) sufficient statistics
+    result = fit_mixedlm(formula, df_day2_hits, 'UserId', cache_dir, collapse=True)
+
+    targets = [name[len('C(Illegal1Name)['):-1] for name in result.params.index if name.startswith('C(Illegal1Name)[')]
+    term_names = [f'C(Illegal1Name)[{target}]' for target in targets]
+    counts = df_day2_hits.groupby('Illegal1Name').agg(Hit_Trials=('RT', 'size'), Users=('UserId', 'nunique'))
+
+    scores = pd.DataFrame({
+        'Illegal1Name': targets,
+        'Difficulty_Score': result.params[term_names].to_numpy(),
+        'Difficulty_SE': result.bse[term_names].to_numpy(),
+    }).merge(counts, left_on='Illegal1Name', right_index=True, how='left')
+
+    split_scores = scores.loc[scores['Illegal1Name'].isin(split_targets), 'Difficulty_Score']
+    median_score = (split_scores if len(split_scores) else scores['Difficulty_Score']).median()
+    scores['Difficulty_Category'] = np.where(scores['Difficulty_Score'] > median_score, 'high', 'low')
+    return scores.sort_values('Difficulty_Score').reset_index(drop=True)
+
+# Load paths
+data_path = os.getenv('DATA_PATH', './data')
+output_path = os.getenv('OUTPUT_PATH', './output')
+difficulty_scores_file = os.getenv('DIFFICULTY_SCORES_FILE', f'{output_path}/target_difficulty_omnibus_lme.csv')
+fit_cache_path = os.getenv('FIT_CACHE_PATH', f'{output_path}/fit_cache') or None
+
+# Targets whose median score defines the high/low split; defaults to the step 3 final targets
+split_targets = os.getenv('DIFFICULTY_SPLIT_TARGETS', 'PISTOL,GASOLINE_CAN,HAMMER,ICE_SKATE,CROSSBOW,LARGE_WATER,DRUGS,BRASS_KNUCKLES').split(',')
+
+# Scores produced outside this pipeline (e.g. from the 5% sandbox) have no Hit_Trials column and are kept
+keep_existing = (os.path.exists(difficulty_scores_file)
+                 and os.getenv('RESCORE_DIFFICULTY') != '1'
+                 and 'Hit_Trials' not in pd.read_csv(difficulty_scores_file, nrows=0).columns)
+
+if keep_existing:
+    print(f"Keeping externally scored target difficulty in {difficulty_scores_file}; set RESCORE_DIFFICULTY=1 to replace it.")
+else:
+    # Read
+    file_path = f'{output_path}/df_HNL_1-2.csv'
+    df = pd.read_csv(file_path, low_memory=False)
+    print(f"In step 2b, reading file: {file_path}")
+
+    # Score; unchanged Day 2 data is served from the fit cache without refitting
+    df_day2_hits = select_day2_hits(df)
+    print(f"Scoring target difficulty from {len(df_day2_hits)} Day 2 hit trials, {df_day2_hits['Illegal1Name'].nunique()} targets, {df_day2_hits['UserId'].nunique()} users.")
+    difficulty_scores = score_target_difficulty(df_day2_hits, split_targets, fit_cache_path)
+
+    # Save
+    difficulty_scores.to_csv(difficulty_scores_file, index=False)
+    print(f"Saved target difficulty scores to {difficulty_scores_file}")
@@ -7,12 +7,14 @@ import os
 # Load paths
 data_path = os.getenv('DATA_PATH', './data')
 output_path = os.getenv('OUTPUT_PATH', './output')
+difficulty_scores_file = os.getenv('DIFFICULTY_SCORES_FILE', f'{output_path}/target_difficulty_omnibus_lme.csv')
 
 # Setup logging
 log_filename = f'filtering_log_{datetime.now().strftime("%Y%m%d_%H%M%S")}.txt'
 logging.basicConfig(filename=log_filename,
                     level=logging.INFO,
-                    format='%(asctime)s - %(levelname)s - %(message)s')
+                    format='%(asctime)s - %(levelname)s - %(message)s',
+                    force=True)
 
 def log_and_print(message):
     print(message)
@@ -157,7 +159,7 @@ df_large_sets['SetSize_Category'] = np.where(df_large_sets['LegalItems'] > 7, 'h
 df_large_sets['Plane'] = np.where(df_large_sets['TrialNumber'] > 12, 2, 1)
 
 # c. Import target difficulty scores from Day 2; note keep using this (scored from sandbox) in real analysis
-difficulty_scores = pd.read_csv(f'{output_path}/target_difficulty_omnibus_lme.csv')
+difficulty_scores = pd.read_csv(difficulty_scores_file)
 df_feature_engineered = df_large_sets.merge(
     difficulty_scores[['Illegal1Name', 'Difficulty_Score', 'Difficulty_Category']],
     on='Illegal1Name',
@@ -0,0 +1,159 @@
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from fit_cache import fit_mixedlm, formula_columns
+
+# Load paths
+data_path = os.getenv('DATA_PATH', './data')
+output_path = os.getenv('OUTPUT_PATH', './output')
+difficulty_scores_file = os.getenv('DIFFICULTY_SCORES_FILE', f'{output_path}/target_difficulty_omnibus_lme.csv')
+sweep_grid_file = os.getenv('SWEEP_GRID', f'{output_path}/sweep_grid.json')
+fit_cache_path = os.getenv('FIT_CACHE_PATH', f'{output_path}/fit_cache') or None
+
+# Downstream LME fitted for every configuration (defaults to the 4b full binary-factor model)
+sweep_formula = os.getenv('SWEEP_FORMULA', 'RT ~ avg_hit_RT_Category * PreviousTargetCondMatch * Difficulty_Category * C(Plane) + (1|UserId)')
+
+# Step 3 analysis choices; these defaults match 3_analysis_specific_filtering.py
+DEFAULT_PARAMS = {
+    'allowed_bitmask': 8 | 16 | 2048,   # users with any other upgrade are removed
+    'max_trials_since': 23,             # users with TrialsSinceLast_{Illegal1Name,target_present}_ByDay above this are removed
+    'illegal_items': 1,                 # number of targets per trial
+    'bag_types': [1, 2, 3, 4],
+    'final_targets': ['PISTOL','GASOLINE_CAN','HAMMER','ICE_SKATE','CROSSBOW','LARGE_WATER','DRUGS','BRASS_KNUCKLES'],
+    'min_legal_items': 4,               # trials need LegalItems above this
+}
+
+# Key columns that must be present for a trial to enter the LME (as in step 3)
+columns_to_check = [
+    'avg_hit_RT_Category', 'PreviousTargetIdMatch', 'PreviousTargetCondMatch',
+    'SetSize_Category', 'Difficulty_Category', 'Plane', 'UserId', 'RT',
+    'TrialNumber', 'TrialsSinceLast_Illegal1Name_ByDay', 'TrialsSinceLast_target_present_ByDay',
+    'LegalItems', 'Illegal1Name', 'avg_hit_RT', 'Cumulative_Illegal1Name_ByDay_Prob',
+    'Cumulative_target_present_ByDay_Prob'
+]
+
+def load_grid(path):
+    """ Expands a JSON grid of parameter values into a list of configurations; missing parameters keep their defaults. """
+    with open(path) as f:
+        grid = json.load(f)
+    unknown = set(grid) - set(DEFAULT_PARAMS)
+    if unknown:
+        raise ValueError(f"Unknown sweep parameters in {path}: {sorted(unknown)}")
+
+    names = list(DEFAULT_PARAMS)
+    values = [grid.get(name, [DEFAULT_PARAMS[name]]) for name in names]
+    return [dict(zip(names, combination)) for combination in itertools.product(*values)]
+
+def prepare_shared_data(df, difficulty_scores):
+    """
+    Computes everything that does not depend on the swept parameters once: Day 2 metrics,
+    per-user exclusion summaries, trial-level features and the difficulty merge for Day 1.
+    """
+    df = df[df['Day'].isin([1, 2])]
+
+    # Per-user summaries; the upgrade and TrialsSince filters remove whole users
+    user_upgrades = df.groupby('UserId')['ActiveUpgrades'].agg(lambda x: np.bitwise_or.reduce(x.to_numpy()))
+    user_max_trials_since = df.groupby('UserId')[['TrialsSinceLast_Illegal1Name_ByDay', 'TrialsSinceLast_target_present_ByDay']].max().max(axis=1)
+
+    # Day 2 metrics are per user, so removing other users never changes them
+    df_day2_tp = df[(df['Day'] == 2) & (df['IllegalItems'] > 0)]
+    metrics_overall = df_day2_tp.groupby('UserId').agg(
+        avg_target_present_accuracy=('TrialResult', lambda x: (x == 'Hit').mean()),
+        avg_hit_RT=('RT', 'mean'),
+        avg_hit_log_RT=('log_RT', 'mean')
+    ).reset_index()
+
+    shared = df[df['Day'] == 1].merge(metrics_overall, on='UserId', how='left')
+    shared['UserActiveUpgrades'] = shared['UserId'].map(user_upgrades)
+    shared['UserMaxTrialsSince'] = shared['UserId'].map(user_max_trials_since)
+
+    # Trial-level features, identical for every configuration
+    shared['Cumulative_Illegal1Name_ByDay_Prob'] = shared['Cumulative_Illegal1Name_ByDay'] / shared['TrialNumber']
+    shared['Cumulative_target_present_ByDay_Prob'] = shared['Cumulative_target_present_ByDay'] / shared['TrialNumber']
+    shared['PreviousTargetIdMatch'] = np.where(shared['TrialsSinceLast_Illegal1Name_ByDay'] == 1, 1, 0)
+    shared['PreviousTargetCondMatch'] = np.where(shared['TrialsSinceLast_target_present_ByDay'] == 1, 1, 0)
+    shared['SetSize_Category'] = np.where(shared['LegalItems'] > 7, 'high', 'low')
+    shared['Plane'] = np.where(shared['TrialNumber'] > 12, 2, 1)
+    shared = shared.merge(
+        difficulty_scores[['Illegal1Name', 'Difficulty_Score', 'Difficulty_Category']],
+        on='Illegal1Name',
+        how='left'
+    )
+
+    # avg_hit_RT_Category is set per configuration and never missing
+    shared['Complete'] = shared[[col for col in columns_to_check if col != 'avg_hit_RT_Category']].notna().all(axis=1)
+    return shared
+
+def select_trials(shared, params):
+    """ Applies one configuration as a mask over the shared data and returns its LME-ready hit trials. """
+    allowed_users = (shared['UserActiveUpgrades'] & ~params['allowed_bitmask']) == 0
+    allowed_users &= ~(shared['UserMaxTrialsSince'] > params['max_trials_since'])
+
+    mask = (
+        allowed_users
+        & (shared['IllegalItems'] == params['illegal_items'])
+        & shared['Type'].isin(params['bag_types'])
+        & shared['Illegal1Name'].isin(params['final_targets'])
+        & (shared['LegalItems'] > params['min_legal_items'])
+    )
+
+    # The median split is taken before hit filtering, as in step 3
+    median_avg_hit_RT = shared.loc[mask, 'avg_hit_RT'].median()
+    keep = mask & (shared['TrialResult'] == 'Hit') & shared['Complete']
+    df_config = shared[keep].copy()
+    df_config['avg_hit_RT_Category'] = np.where(df_config['avg_hit_RT'] > median_avg_hit_RT, 'high', 'low')
+    return df_config
+
+def describe_params(params):
+    """ Flattens list-valued parameters so each configuration fits in one table row. """
+    return {name: '|'.join(map(str, value)) if isinstance(value, list) else value for name, value in params.items()}
+
+def fit_configuration(config_id, params, df_config, formula, cache_dir):
+    """ Fits the downstream LME for one configuration and returns one row per model term. """
+    base = {'config_id': config_id, **describe_params(params),
+            'n_trials': len(df_config), 'n_users': df_config['UserId'].nunique()}
+    if df_config.empty:
+        return [{**base, 'error': 'No trials left after filtering'}]
+    try:
+        result = fit_mixedlm(formula, df_config, 'UserId', cache_dir)
+    except Exception as e:
+        return [{**base, 'error': str(e)}]
+
+    return [
+        {**base, 'llf': result.llf, 'converged': result.converged, 'term': term,
+         'estimate': result.params[term], 'std_err': result.bse[term], 'p_value': result.pvalues[term]}
+        for term in result.params.index
+    ]
+
+def run_sweep(df, difficulty_scores, configurations, formula, cache_dir=None, max_workers=None):
+    """ Runs every configuration over the shared data, fitting the per-configuration LMEs in parallel. """
+    shared = prepare_shared_data(df, difficulty_scores)
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = []
+        for config_id, params in enumerate(configurations):
+            df_config = select_trials(shared, params)
+            # Only the model columns are sent to the worker
+            model_columns = sorted(set(formula_columns(formula, df_config)) | {'UserId'})
+            futures.append(executor.submit(fit_configuration, config_id, params, df_config[model_columns], formula, cache_dir))
+        rows = [row for future in futures for row in future.result()]
+    return pd.DataFrame(rows)
+
+if __name__ == '__main__':
+    file_path = f'{output_path}/df_HNL_1-2_recent_occurrence.csv'
+    df = pd.read_csv(file_path, low_memory=False)
+    print(f"In sweep, reading file: {file_path}")
+    difficulty_scores = pd.read_csv(difficulty_scores_file)
+
+    configurations = load_grid(sweep_grid_file)
+    print(f"Sweeping {len(configurations)} configurations from {sweep_grid_file}")
+
+    max_workers = int(os.getenv('SWEEP_WORKERS', '0')) or None
+    results = run_sweep(df, difficulty_scores, configurations, sweep_formula, fit_cache_path, max_workers)
+
+    results_path = f'{output_path}/multiverse_sweep_results.csv'
+    results.to_csv(results_path, index=False)
+    print(f"Saved sweep results for {results['config_id'].nunique()} configurations to {results_path}")
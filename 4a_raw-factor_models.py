@@ -1,10 +1,10 @@
 import sys
-import statsmodels.formula.api as smf
 from scipy.stats import chi2
 import pickle
 import numpy as np
 import pandas as pd
 import os
+from fit_cache import fit_mixedlm
 
 def calculate_bic(model, n):
     """Calculate BIC manually for a given fitted model."""
@@ -43,6 +43,9 @@ data_path = os.getenv('DATA_PATH', './data')
 output_path = os.getenv('OUTPUT_PATH', './output')
 df_cleaned = pd.read_csv(f'{output_path}/df_HNL1_hits_final_cleaned_for_LME.csv', low_memory=False)
 
+# On-disk fit cache; set FIT_CACHE_PATH to an empty string to always refit
+fit_cache_path = os.getenv('FIT_CACHE_PATH', f'{output_path}/fit_cache') or None
+
 # Define the variables
 categorical_ivs = ['TrialNumber','TrialsSinceLast_Illegal1Name_ByDay','TrialsSinceLast_target_present_ByDay','LegalItems','Illegal1Name']
 continuous_ivs = ['avg_hit_RT','Cumulative_Illegal1Name_ByDay_Prob','Cumulative_target_present_ByDay_Prob']
@@ -64,7 +67,7 @@ with open(log_path, 'w') as log_file:
     try:
         # Full model
         full_formula = f'RT ~ C(TrialNumber)+C(TrialsSinceLast_Illegal1Name_ByDay)+C(TrialsSinceLast_target_present_ByDay)+C(LegalItems)+C(Illegal1Name, Treatment(reference="{reference_level}")) + avg_hit_RT+Cumulative_Illegal1Name_ByDay_Prob+Cumulative_target_present_ByDay_Prob + (1|UserId)'
-        full_model = smf.mixedlm(full_formula, df_cleaned, groups=df_cleaned['UserId']).fit()
+        full_model = fit_mixedlm(full_formula, df_cleaned, grouping_var, fit_cache_path, keep_result=True)
 
         # Save the full model output
         save_model_outputs(full_model, f'{output_path}/omnibus_full_model_summary.txt', f'{output_path}/omnibus_full_model.pkl', f'{output_path}/omnibus_full_model_results.pkl')
@@ -91,7 +94,7 @@ with open(log_path, 'w') as log_file:
         reduced_models = []
         for name, formula in reduced_formulas.items():
             try:
-                reduced_model = smf.mixedlm(formula, df_cleaned, groups=df_cleaned['UserId']).fit()
+                reduced_model = fit_mixedlm(formula, df_cleaned, grouping_var, fit_cache_path)
                 reduced_models.append((name, reduced_model))
             except Exception as e:
                 print(f"Error fitting model '{name}': {str(e)}")
@@ -108,7 +111,7 @@ with open(log_path, 'w') as log_file:
             remaining_vars = [v for v in all_vars if v != var]
             reduced_formula = f"RT ~ {' + '.join(remaining_vars)} + (1|UserId)"
             try:
-                reduced_model = smf.mixedlm(reduced_formula, df_cleaned, groups=df_cleaned['UserId']).fit()
+                reduced_model = fit_mixedlm(reduced_formula, df_cleaned, grouping_var, fit_cache_path)
                 print(f"\nTesting without {var}")
                 lr_stat, p_value = likelihood_ratio_test(full_model, reduced_model)
                 print(f"LRT stat: {lr_stat}, p-value: {p_value}")
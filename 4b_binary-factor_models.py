@@ -1,9 +1,9 @@
 import sys
-import statsmodels.formula.api as smf
 from scipy.stats import chi2
 import pandas as pd
 import pickle
 import os
+from fit_cache import fit_mixedlm
 
 def calculate_bic(model):
     """Return the BIC for the model."""
@@ -31,6 +31,13 @@ output_path = os.getenv('OUTPUT_PATH', './output')
 
 df_cleaned_simple = pd.read_csv(f'{output_path}/df_HNL1_hits_final_cleaned_for_LME.csv', low_memory=False)
 
+# On-disk fit cache; set FIT_CACHE_PATH to an empty string to always refit
+fit_cache_path = os.getenv('FIT_CACHE_PATH', f'{output_path}/fit_cache') or None
+
+# 'cells' fits from per-(UserId, design cell) counts/sums/sums of squares instead of trial rows;
+# exact here since every predictor is binary
+collapse_cells = os.getenv('BINARY_FIT_MODE', 'trials') == 'cells'
+
 # Define the log file path
 log_path = f'{output_path}/omnibus_lme_median_split_lrt_log.txt'
 
@@ -42,7 +49,7 @@ with open(log_path, 'w') as log_file:
     try:
         # Full model
         full_formula = 'RT ~ avg_hit_RT_Category * PreviousTargetCondMatch * Difficulty_Category * C(Plane) + (1|UserId)'
-        full_model = smf.mixedlm(full_formula, df_cleaned_simple, groups=df_cleaned_simple['UserId']).fit()
+        full_model = fit_mixedlm(full_formula, df_cleaned_simple, 'UserId', fit_cache_path, keep_result=True, collapse=collapse_cells)
         print(full_model.summary())
     except Exception as e:
         print(f"Error fitting full model: {str(e)}")
@@ -59,7 +66,7 @@ with open(log_path, 'w') as log_file:
     # Fit and save reduced models, compare with full model
     for name, formula in reduced_formulas.items():
         try:
-            reduced_model = smf.mixedlm(formula, df_cleaned_simple, groups=df_cleaned_simple['UserId']).fit()
+            reduced_model = fit_mixedlm(formula, df_cleaned_simple, 'UserId', fit_cache_path, collapse=collapse_cells)
             lr_stat, p_value = likelihood_ratio_test(full_model, reduced_model)
             bic = calculate_bic(reduced_model)
             print(f"\n{name}:")
@@ -0,0 +1,132 @@
+import hashlib
+import os
+import pickle
+import re
+import pandas as pd
+import statsmodels
+import statsmodels.formula.api as smf
+from suffstat_lmm import SuffStatMixedLM
+
+# Bump when the cached record layout changes so stale entries are ignored
+CACHE_VERSION = 2
+
+class CachedFit:
+    """Fit statistics restored from the cache (llf, params, BIC, standard errors) without the fitted model."""
+    def __init__(self, llf, params, bic, nobs, bse, pvalues, converged):
+        self.llf = llf
+        self.params = params
+        self.bic = bic
+        self.nobs = nobs
+        self.bse = bse
+        self.pvalues = pvalues
+        self.converged = converged
+
+def _split_terms(rhs):
+    """ Splits the right-hand side of a formula on top-level '+' signs. """
+    terms, depth, current = [], 0, ''
+    for char in rhs:
+        if char in '([':
+            depth += 1
+        elif char in ')]':
+            depth -= 1
+        if char == '+' and depth == 0:
+            terms.append(current)
+            current = ''
+        else:
+            current += char
+    terms.append(current)
+    return [re.sub(r'\s+', '', term) for term in terms if term.strip()]
+
+def normalize_formula(formula):
+    """ Normalizes a formula so that term order and whitespace do not change the cache key. """
+    lhs, rhs = formula.split('~', 1)
+    terms = sorted(set(_split_terms(rhs)))
+    return f"{lhs.strip()} ~ {' + '.join(terms)}"
+
+def formula_columns(formula, df):
+    """ Returns the data columns referenced by a formula, in sorted order. """
+    tokens = set(re.findall(r'[A-Za-z_][A-Za-z0-9_]*', formula))
+    return sorted(col for col in df.columns if col in tokens)
+
+def hash_data_columns(df, columns):
+    """ Hashes the values, dtypes and category orderings of the given columns. """
+    digest = hashlib.sha256()
+    for col in columns:
+        digest.update(col.encode())
+        digest.update(str(df[col].dtype).encode())
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            digest.update(repr(list(df[col].cat.categories)).encode())
+            digest.update(str(df[col].cat.ordered).encode())
+    digest.update(pd.util.hash_pandas_object(df[columns], index=False).values.tobytes())
+    return digest.hexdigest()
+
+def fit_cache_key(formula, df, group_col, fit_kwargs=None, collapse=False):
+    """ Builds the cache key from the normalized model specification and a hash of the data it uses. """
+    columns = sorted(set(formula_columns(formula, df)) | {group_col})
+    spec = '|'.join([
+        str(CACHE_VERSION),
+        statsmodels.__version__,
+        normalize_formula(formula),
+        f'groups={group_col}',
+        f'collapse={collapse}',
+        repr(sorted((fit_kwargs or {}).items())),
+    ])
+    return hashlib.sha256(f'{spec}|{hash_data_columns(df, columns)}'.encode()).hexdigest()
+
+def _load_entry(path):
+    """ Loads a cache entry, treating unreadable or truncated files as a miss. """
+    try:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        return None
+
+def _save_entry(path, entry):
+    """ Writes a cache entry atomically so concurrent runs never read a partial file. """
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(entry, f)
+    os.replace(tmp_path, path)
+
+def _fit(formula, df, group_col, collapse, fit_kwargs):
+    """ Fits on the trial rows with statsmodels, or on per-(group, cell) sufficient statistics if collapse is set. """
+    if collapse:
+        return SuffStatMixedLM.from_formula(formula, df, group_col, reml=fit_kwargs.get('reml', True)).fit()
+    return smf.mixedlm(formula, df, groups=df[group_col]).fit(**fit_kwargs)
+
+def fit_mixedlm(formula, df, group_col, cache_dir=None, keep_result=False, collapse=False, **fit_kwargs):
+    """
+    Fits a random-intercept mixed model, reusing a stored fit when the same model specification
+    has already been fitted to identical data. Cache hits return a CachedFit with llf/params/BIC,
+    or the stored results object if the entry was written with keep_result=True.
+    With collapse=True the model is fitted exactly from per-(group, cell) sufficient statistics,
+    which requires every predictor to be discrete.
+    """
+    if cache_dir is None:
+        return _fit(formula, df, group_col, collapse, fit_kwargs)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    key = fit_cache_key(formula, df, group_col, fit_kwargs, collapse)
+    path = os.path.join(cache_dir, f'{key}.pkl')
+
+    entry = _load_entry(path)
+    if entry is not None and (entry['result'] is not None or not keep_result):
+        print(f"Fit cache hit for: {formula}")
+        if keep_result:
+            return entry['result']
+        return CachedFit(entry['llf'], entry['params'], entry['bic'], entry['nobs'],
+                         entry['bse'], entry['pvalues'], entry['converged'])
+
+    result = _fit(formula, df, group_col, collapse, fit_kwargs)
+    _save_entry(path, {
+        'formula': formula,
+        'llf': result.llf,
+        'params': result.params,
+        'bic': result.bic,
+        'nobs': result.nobs,
+        'bse': result.bse,
+        'pvalues': result.pvalues,
+        'converged': result.converged,
+        'result': result if keep_result else None,
+    })
+    return result
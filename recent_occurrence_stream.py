@@ -0,0 +1,144 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+# Variables tracked by step 2 (2_add_recent_occurrence_vars.py)
+OCCURRENCE_IVS = ['Illegal1Name', 'target_present', 'Type']
+
+# Columns emitted for every trial, in the order of update()'s output
+FEATURE_COLUMNS = [
+    f"{prefix}_{iv_name}{suffix}"
+    for iv_name in OCCURRENCE_IVS
+    for prefix, suffix in [('TrialsSinceLast', '_ByDay'), ('Cumulative', '_ByDay'), ('Last_TrialResult_for', ''), ('Last_IllegalItems_for', '')]
+] + [
+    'Cumulative_Illegal1Color_AsIllegal', 'Cumulative_Illegal1Color_AsLegal', 'CurrentTrial_ColorMatch_Flag',
+    'LastColorMatchTrial', 'TrialsSinceLast_ColorMatch_ByDay', 'Last_TrialResult_for_ColorMatch', 'Last_IllegalItems_for_ColorMatch',
+]
+
+class _DayState:
+    """Compact state for one (UserId, Day): the last trial, count and result seen for each value."""
+    __slots__ = ('day', 'last_trial', 'counts', 'last_result', 'last_match_trial', 'last_match_result', 'last_trial_number')
+
+    def __init__(self, day):
+        self.day = day
+        self.last_trial = {iv_name: {} for iv_name in OCCURRENCE_IVS}
+        self.counts = {iv_name: {} for iv_name in OCCURRENCE_IVS}
+        self.last_result = {iv_name: {} for iv_name in OCCURRENCE_IVS}
+        self.last_match_trial = None
+        self.last_match_result = (np.nan, np.nan)
+        self.last_trial_number = None
+
+class RecentOccurrenceState:
+    """
+    Incremental version of the step 2 recent-occurrence features for live trial feeds.
+
+    Each call to update() takes one trial event and returns the step 2 feature columns for it,
+    in O(1) per event. Events for a user must arrive in TrialNumber order within a day. Starting
+    a new Day resets that user's state, as the batch features reset per (UserId, Day).
+
+    TrialsSinceLast_ColorMatch_ByDay counts trials since the most recent color match so far. The
+    batch version uses the day's last match for every row, so the two agree only from that match onward.
+    """
+    def __init__(self, illegal_color_columns, legal_color_columns):
+        self.illegal_color_columns = list(illegal_color_columns)
+        self.legal_color_columns = list(legal_color_columns)
+        self.users = {}
+
+    def _state_for(self, user_id, day):
+        """ Returns the state for the user's current day, starting a fresh one when the day changes. """
+        state = self.users.get(user_id)
+        if state is None or state.day != day:
+            state = _DayState(day)
+            self.users[user_id] = state
+        return state
+
+    def update(self, event):
+        """ Consumes one trial event (a dict or row) and returns its feature values. """
+        state = self._state_for(event['UserId'], event['Day'])
+        trial_number = event['TrialNumber']
+        if state.last_trial_number is not None and trial_number <= state.last_trial_number:
+            raise ValueError(f"Trial {trial_number} for user {event['UserId']} on day {state.day} arrived after trial {state.last_trial_number}")
+        state.last_trial_number = trial_number
+        trial_result = (event['TrialResult'], event['IllegalItems'])
+
+        features = {}
+        for iv_name in OCCURRENCE_IVS:
+            value = event[iv_name]
+            since, cumulative, last_result = np.nan, 0, (np.nan, np.nan)
+            if pd.notnull(value):
+                if value in state.last_trial[iv_name]:
+                    since = trial_number - state.last_trial[iv_name][value]
+                    last_result = state.last_result[iv_name][value]
+                cumulative = state.counts[iv_name].get(value, 0) + 1
+                state.last_trial[iv_name][value] = trial_number
+                state.counts[iv_name][value] = cumulative
+                state.last_result[iv_name][value] = trial_result
+            features[f"TrialsSinceLast_{iv_name}_ByDay"] = since
+            features[f"Cumulative_{iv_name}_ByDay"] = cumulative
+            features[f"Last_TrialResult_for_{iv_name}"] = last_result[0]
+            features[f"Last_IllegalItems_for_{iv_name}"] = last_result[1]
+
+        illegal_colors = {event[col] for col in self.illegal_color_columns if pd.notnull(event[col])}
+        legal_colors = {event[col] for col in self.legal_color_columns if pd.notnull(event[col])}
+        match_occurred = bool(illegal_colors.intersection(legal_colors))
+        if match_occurred:
+            state.last_match_trial = trial_number
+            state.last_match_result = trial_result
+
+        # Same membership test as calculate_color_match_details in step 2
+        features['Cumulative_Illegal1Color_AsIllegal'] = int('Illegal1Color' in illegal_colors)
+        features['Cumulative_Illegal1Color_AsLegal'] = int('Illegal1Color' in legal_colors)
+        features['CurrentTrial_ColorMatch_Flag'] = match_occurred
+        features['LastColorMatchTrial'] = trial_number if match_occurred else np.nan
+        if state.last_match_trial is None:
+            features['TrialsSinceLast_ColorMatch_ByDay'] = np.nan
+            features['Last_TrialResult_for_ColorMatch'] = np.nan
+            features['Last_IllegalItems_for_ColorMatch'] = np.nan
+        else:
+            features['TrialsSinceLast_ColorMatch_ByDay'] = trial_number - state.last_match_trial
+            features['Last_TrialResult_for_ColorMatch'] = state.last_match_result[0]
+            features['Last_IllegalItems_for_ColorMatch'] = state.last_match_result[1]
+        return features
+
+def stream_features(df, illegal_color_columns, legal_color_columns):
+    """ Replays a finished dataset through RecentOccurrenceState, one row at a time. """
+    state = RecentOccurrenceState(illegal_color_columns, legal_color_columns)
+    return pd.DataFrame([state.update(row) for row in df.to_dict('records')], index=df.index, columns=FEATURE_COLUMNS)
+
+def compare_with_batch(df):
+    """
+    Checks streamed features against the step 2 batch columns of the same data and returns the number
+    of mismatching rows per column. The ColorMatch recency columns are only compared from the day's last
+    color match onward, where the batch values do not depend on later trials.
+    """
+    # Color columns as step 2 selects them from its input, i.e. before the feature columns exist
+    input_columns = [col for col in df.columns if col not in FEATURE_COLUMNS]
+    legal_color_columns = [col for col in input_columns if 'Legal' in col and 'Color' in col]
+    illegal_color_columns = [col for col in input_columns if 'Illegal' in col and 'Color' in col]
+    streamed = stream_features(df, illegal_color_columns, legal_color_columns)
+
+    last_match = df['LastColorMatchTrial'].groupby([df['UserId'], df['Day']]).transform('max')
+    after_last_match = df['TrialNumber'] >= last_match
+    lookahead_columns = ['TrialsSinceLast_ColorMatch_ByDay', 'Last_TrialResult_for_ColorMatch', 'Last_IllegalItems_for_ColorMatch']
+
+    mismatches = {}
+    for col in streamed.columns:
+        rows = after_last_match | last_match.isna() if col in lookahead_columns else slice(None)
+        batch_values, stream_values = df.loc[rows, col], streamed.loc[rows, col]
+        same = (batch_values == stream_values) | (batch_values.isna() & stream_values.isna())
+        mismatches[col] = int((~same).sum())
+    return mismatches
+
+if __name__ == '__main__':
+    # Parity check against the batch output of step 2
+    output_path = os.getenv('OUTPUT_PATH', './output')
+    file_path = f'{output_path}/df_HNL_1-2_recent_occurrence.csv'
+    df = pd.read_csv(file_path, low_memory=False)
+    print(f"Checking streamed features against: {file_path}")
+
+    mismatches = compare_with_batch(df)
+    for col, count in mismatches.items():
+        print(f"{col}: {'OK' if count == 0 else f'{count} mismatching rows'}")
+    if any(mismatches.values()):
+        sys.exit(1)
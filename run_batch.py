@@ -0,0 +1,135 @@
+import contextlib
+import importlib.util
+import os
+import runpy
+import sys
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+# Pipeline stages run for every dataset, after the color/name mapping from misc/add_color.py
+STAGES = [
+    '1_general_data_prep.py',
+    '2_add_recent_occurrence_vars.py',
+    '2b_target_difficulty_scoring.py',
+    '3_analysis_specific_filtering.py',
+    '4a_raw-factor_models.py',
+    '4b_binary-factor_models.py',
+]
+
+def load_add_color():
+    """ Imports misc/add_color.py, which is not part of a package. """
+    spec = importlib.util.spec_from_file_location('add_color', os.path.join(script_dir, 'misc', 'add_color.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def dataset_namespace(data_file):
+    """ Returns the name of the output subdirectory for a dataset, e.g. 'Honolulu_sandboxId_1-2'. """
+    return os.path.splitext(os.path.basename(data_file))[0]
+
+# Lookups shared by every dataset handled in a worker process, set once by init_worker
+_worker_state = {}
+
+def init_worker(lookups):
+    """ Stores the item ID/name/color lookups loaded by the parent process. """
+    _worker_state['add_color'] = load_add_color()
+    _worker_state['lookups'] = lookups
+
+def run_dataset(data_file, schema, data_path, output_path, difficulty_scores_file):
+    """ Runs the full pipeline for one dataset inside its own output namespace. """
+    namespace = dataset_namespace(data_file)
+    dataset_output_path = os.path.join(output_path, namespace)
+    os.makedirs(dataset_output_path, exist_ok=True)
+
+    # The stage scripts read their paths from the environment
+    os.environ['DATA_PATH'] = data_path
+    os.environ['OUTPUT_PATH'] = dataset_output_path
+    os.environ['DATA_FILE'] = os.path.basename(data_file)
+    # Always set explicitly so workers never share a score path inherited from the parent environment
+    os.environ['DIFFICULTY_SCORES_FILE'] = difficulty_scores_file or os.path.join(dataset_output_path, 'target_difficulty_omnibus_lme.csv')
+    # Step 3 writes its filtering log to the working directory
+    os.chdir(dataset_output_path)
+
+    log_path = os.path.join(dataset_output_path, 'batch_log.txt')
+    with open(log_path, 'w') as log_file:
+        try:
+            with contextlib.redirect_stdout(log_file):
+                _worker_state['add_color'].apply_color_name_mapping(
+                    os.path.join(data_path, data_file),
+                    os.path.join(dataset_output_path, f'wColor_{os.path.basename(data_file)}'),
+                    _worker_state['lookups'],
+                    schema,
+                )
+            # Datasets sharing one difficulty score file are not re-scored individually
+            stages = [stage for stage in STAGES if not (difficulty_scores_file and stage == '2b_target_difficulty_scoring.py')]
+            # Redirect per stage since 4a resets sys.stdout when it finishes
+            for stage in stages:
+                with contextlib.redirect_stdout(log_file):
+                    print(f"Running {stage}...")
+                    runpy.run_path(os.path.join(script_dir, stage), run_name='__main__')
+        except Exception:
+            log_file.write(traceback.format_exc())
+            return namespace, False, log_path
+    return namespace, True, log_path
+
+def run_batch(data_files, data_path, output_path, max_workers=None):
+    """ Runs the pipeline for several datasets concurrently, loading the shared lookups only once. """
+    data_path = os.path.abspath(data_path)
+    output_path = os.path.abspath(output_path)
+    os.makedirs(output_path, exist_ok=True)
+
+    namespaces = [dataset_namespace(data_file) for data_file in data_files]
+    if len(set(namespaces)) != len(namespaces):
+        raise ValueError(f"Datasets must have distinct file names to get separate output folders: {data_files}")
+
+    add_color = load_add_color()
+    lookups = add_color.load_lookups()
+
+    # Datasets with the same header share one schema
+    schemas = {}
+    dataset_schemas = []
+    for data_file in data_files:
+        columns = tuple(pd.read_csv(os.path.join(data_path, data_file), nrows=0).columns)
+        if columns not in schemas:
+            schemas[columns] = add_color.build_schema(columns)
+        dataset_schemas.append(schemas[columns])
+
+    # An external difficulty score file (e.g. from the 5% sandbox) is used by every dataset. Files written by
+    # 2b_target_difficulty_scoring.py have a Hit_Trials column and belong to one dataset, so they are not shared.
+    difficulty_scores_file = os.getenv('DIFFICULTY_SCORES_FILE', os.path.join(output_path, 'target_difficulty_omnibus_lme.csv'))
+    if not (os.path.exists(difficulty_scores_file)
+            and 'Hit_Trials' not in pd.read_csv(difficulty_scores_file, nrows=0).columns):
+        difficulty_scores_file = None
+
+    max_workers = min(max_workers or os.cpu_count(), len(data_files))
+    print(f"Running {len(data_files)} datasets on {max_workers} workers, outputs in {output_path}")
+
+    results = []
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=init_worker, initargs=(lookups,)) as executor:
+        futures = [
+            executor.submit(run_dataset, data_file, schema, data_path, output_path, difficulty_scores_file)
+            for data_file, schema in zip(data_files, dataset_schemas)
+        ]
+        for future in as_completed(futures):
+            namespace, succeeded, log_path = future.result()
+            print(f"{namespace}: {'done' if succeeded else 'FAILED'} (log: {log_path})")
+            results.append((namespace, succeeded))
+    return results
+
+if __name__ == '__main__':
+    # Datasets come from the command line or a comma-separated DATA_FILES, relative to DATA_PATH
+    data_path = os.getenv('DATA_PATH', './data')
+    output_path = os.getenv('OUTPUT_PATH', './output')
+    data_files = sys.argv[1:] or [f.strip() for f in os.getenv('DATA_FILES', '').split(',') if f.strip()]
+    if not data_files:
+        sys.exit("No datasets given. Pass data files as arguments or set DATA_FILES.")
+    max_workers = int(os.getenv('BATCH_WORKERS', '0')) or None
+
+    results = run_batch(data_files, data_path, output_path, max_workers)
+    failed = [namespace for namespace, succeeded in results if not succeeded]
+    print(f"Batch complete: {len(results) - len(failed)} succeeded, {len(failed)} failed.")
+    if failed:
+        sys.exit(1)
@@ -0,0 +1,158 @@
+import re
+import numpy as np
+import pandas as pd
+import patsy
+from scipy import optimize
+from scipy.stats import norm
+from statsmodels.iolib import summary2
+
+def collapse_to_cells(df, formula, group_col):
+    """
+    Collapses trial-level data to one row per (group, design cell) with the trial count and the
+    sum and sum of squares of the dependent variable. All predictors in the formula must be discrete.
+    """
+    dv, rhs = [part.strip() for part in formula.split('~', 1)]
+    tokens = set(re.findall(r'[A-Za-z_][A-Za-z0-9_]*', rhs))
+    predictors = sorted(col for col in df.columns if col in tokens and col not in (dv, group_col))
+    keys = [group_col] + predictors
+
+    df = df.dropna(subset=keys + [dv])
+    return (df.assign(_dv_sq=df[dv] ** 2)
+              .groupby(keys, sort=True, observed=True)
+              .agg(n=(dv, 'size'), dv_sum=(dv, 'sum'), dv_sumsq=('_dv_sq', 'sum'))
+              .reset_index())
+
+class SuffStatMixedLM:
+    """
+    Random-intercept linear mixed model fitted exactly from per-(group, cell) sufficient statistics.
+
+    Gives the same fit as statsmodels' MixedLM with a random intercept per group. Memory and
+    fit time depend on groups x cells instead of on the number of trials. The fixed-effects
+    design is built with patsy from the full formula, just as statsmodels builds it.
+    """
+    def __init__(self, formula, cells, group_col, reml=True):
+        self.formula = formula
+        self.cells = cells
+        self.group_col = group_col
+        self.reml = reml
+
+        rhs = formula.split('~', 1)[1]
+        design = patsy.dmatrix(rhs, cells, return_type='dataframe')
+        self.exog_names = list(design.columns)
+        self.exog = design.to_numpy()
+        self.n = cells['n'].to_numpy(dtype=float)
+        self.dv_sum = cells['dv_sum'].to_numpy(dtype=float)
+        self.dv_sumsq = cells['dv_sumsq'].to_numpy(dtype=float)
+
+        # Per-group totals: trial counts, n-weighted design rows and dv sums
+        self.group_codes, self.group_labels = pd.factorize(cells[group_col], sort=True)
+        n_groups = len(self.group_labels)
+        self.group_n = np.bincount(self.group_codes, weights=self.n, minlength=n_groups)
+        self.group_exog = np.zeros((n_groups, self.exog.shape[1]))
+        np.add.at(self.group_exog, self.group_codes, self.n[:, None] * self.exog)
+        self.group_dv_sum = np.bincount(self.group_codes, weights=self.dv_sum, minlength=n_groups)
+
+        # Pooled moments, as if every trial were independent
+        self.xtx = (self.n[:, None] * self.exog).T @ self.exog
+        self.xty = self.exog.T @ self.dv_sum
+        self.yty = self.dv_sumsq.sum()
+
+        self.nobs = int(self.n.sum())
+        self.k_fe = self.exog.shape[1]
+
+    @classmethod
+    def from_formula(cls, formula, df, group_col, reml=True):
+        """ Collapses trial-level data and builds the model. """
+        return cls(formula, collapse_to_cells(df, formula, group_col), group_col, reml)
+
+    def _profile(self, ratio):
+        """
+        For a random-intercept to residual variance ratio, returns the GLS fixed effects,
+        the quadratic form, X'V^-1 X and log|V|, with V in units of the residual variance.
+        """
+        weight = ratio / (1 + self.group_n * ratio)
+        xvx = self.xtx - (weight[:, None] * self.group_exog).T @ self.group_exog
+        xvy = self.xty - self.group_exog.T @ (weight * self.group_dv_sum)
+        yvy = self.yty - np.sum(weight * self.group_dv_sum ** 2)
+        fe_params = np.linalg.solve(xvx, xvy)
+        qf = yvy - fe_params @ xvy
+        logdet = np.sum(np.log1p(self.group_n * ratio))
+        return fe_params, qf, xvx, logdet
+
+    def loglike(self, ratio):
+        """ Profile log-likelihood (REML or ML), defined the same way as statsmodels MixedLM.loglike. """
+        _, qf, xvx, logdet = self._profile(ratio)
+        likeval = -logdet / 2.
+        if self.reml:
+            dof = self.nobs - self.k_fe
+            likeval -= dof * np.log(qf) / 2.
+            likeval -= np.linalg.slogdet(xvx)[1] / 2.
+        else:
+            dof = self.nobs
+            likeval -= dof * np.log(qf) / 2.
+        likeval -= dof * np.log(2 * np.pi) / 2.
+        likeval += dof * np.log(dof) / 2.
+        likeval -= dof / 2.
+        return likeval
+
+    def fit(self, log_ratio_bounds=(-20., 10.)):
+        """ Maximizes the profile likelihood over the variance ratio, including the zero boundary. """
+        opt = optimize.minimize_scalar(lambda t: -self.loglike(np.exp(t)), bounds=log_ratio_bounds,
+                                       method='bounded', options={'xatol': 1e-10})
+        ratio = np.exp(opt.x)
+        if self.loglike(0.) >= self.loglike(ratio):
+            ratio = 0.
+        return SuffStatMixedLMResults(self, ratio, bool(opt.success))
+
+class SuffStatMixedLMResults:
+    """Results of a sufficient-statistic fit, with the attributes the 4a/4b reports use."""
+    def __init__(self, model, ratio, converged):
+        self.model = model
+        self.reml = model.reml
+        self.converged = converged
+        self.nobs = model.nobs
+
+        fe_params, qf, xvx, _ = model._profile(ratio)
+        self.scale = qf / (model.nobs - model.k_fe if model.reml else model.nobs)
+        self.cov_re = ratio * self.scale
+        self.llf = model.loglike(ratio)
+
+        # Group Var is reported relative to the residual variance, as in statsmodels' params
+        names = model.exog_names + ['Group Var']
+        self.fe_params = pd.Series(fe_params, index=model.exog_names)
+        self.params = pd.Series(np.append(fe_params, ratio), index=names)
+        fe_bse = np.sqrt(np.diag(np.linalg.inv(xvx)) * self.scale)
+        self.bse = pd.Series(np.append(fe_bse, np.nan), index=names)
+        self.tvalues = self.params / self.bse
+        self.pvalues = pd.Series(2 * norm.sf(np.abs(self.tvalues)), index=names)
+
+    @property
+    def bic(self):
+        """BIC, undefined for REML fits as in statsmodels."""
+        if self.reml:
+            return np.nan
+        return -2 * self.llf + np.log(self.nobs) * (self.params.size + 1)
+
+    def summary(self):
+        """Summary table in the layout of the statsmodels MixedLM summary."""
+        smry = summary2.Summary()
+        smry.add_title('Mixed Linear Model Regression Results (sufficient statistics)')
+        smry.add_dict({
+            'Model:': 'SuffStatMixedLM',
+            'Dependent Variable:': self.model.formula.split('~', 1)[0].strip(),
+            'No. Observations:': str(self.nobs),
+            'No. Groups:': str(len(self.model.group_labels)),
+            'No. Cells:': str(len(self.model.cells)),
+            'Method:': 'REML' if self.reml else 'ML',
+            'Scale:': f'{self.scale:.4f}',
+            'Log-Likelihood:': f'{self.llf:.4f}',
+            'Converged:': 'Yes' if self.converged else 'No',
+        })
+        table = pd.DataFrame({
+            'Coef.': np.append(self.fe_params.to_numpy(), self.cov_re),
+            'Std.Err.': self.bse.to_numpy(),
+            'z': self.tvalues.to_numpy(),
+            'P>|z|': self.pvalues.to_numpy(),
+        }, index=self.params.index)
+        smry.add_df(table.round(4).astype(object).where(table.notna(), ''), align='r')
+        return smry